@@ -0,0 +1,190 @@
+from __future__ import division
+
+import os
+import sys
+import tempfile
+from array import array
+
+from mcts.base.base import BaseState
+from mcts.example.naughtsandcrosses import NaughtsAndCrossesState, Action
+from mcts.searcher.mcts import MCTS
+
+CELLS = 9
+STATE_COUNT = 3 ** CELLS
+# base-3 digit of a cell: 0 ... empty, 1 ... player 1, 2 ... player -1
+DIGITS = {0: 0, 1: 1, -1: 2}
+POWERS = [3 ** cell for cell in range(CELLS)]
+
+# bump TABLE_VERSION whenever the table layout or the game rules change
+TABLE_VERSION = 1
+TABLE_HEADER = b"MCTS-NAC" + bytes([TABLE_VERSION]) + sys.byteorder.encode()
+TABLE_CACHE_PATH = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                                "mcts", "naughtsandcrosses-v%d.bin" % TABLE_VERSION)
+
+
+def decode_board(code):
+    board = [[0, 0, 0], [0, 0, 0], [0, 0, 0]]
+    for cell in range(CELLS):
+        code, digit = divmod(code, 3)
+        board[cell // 3][cell % 3] = (0, 1, -1)[digit]
+    return board
+
+
+def encode_board(board):
+    return sum(DIGITS[board[cell // 3][cell % 3]] * POWERS[cell] for cell in range(CELLS))
+
+
+def build_tables():
+    """
+    Evaluates every board once with NaughtsAndCrossesState, so both implementations agree on every state.
+
+    Returns
+    -------
+    (array, array, array, array): current player, terminal flag, reward and bitmask of empty cells, indexed by code
+    """
+    players = array('b', bytes(STATE_COUNT))
+    terminals = array('b', bytes(STATE_COUNT))
+    rewards = array('b', bytes(STATE_COUNT))
+    moves = array('H', bytes(2 * STATE_COUNT))
+    state = NaughtsAndCrossesState()
+    for code in range(STATE_COUNT):
+        state.board = decode_board(code)
+        cells = sum(state.board, [])
+        players[code] = 1 if cells.count(1) == cells.count(-1) else -1
+        terminals[code] = state.is_terminal()
+        rewards[code] = int(state.get_reward())
+        moves[code] = sum(1 << cell for cell in range(CELLS) if cells[cell] == 0)
+    return players, terminals, rewards, moves
+
+
+def read_tables(path):
+    """
+    Reads the lookup tables from the cache file at path.
+
+    Returns
+    -------
+    (array, array, array, array): the tables as returned by build_tables, or None if the file is missing or invalid
+    """
+    tables = (array('b'), array('b'), array('b'), array('H'))
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+    if len(data) != len(TABLE_HEADER) + STATE_COUNT * sum(table.itemsize for table in tables):
+        return None
+    if not data.startswith(TABLE_HEADER):
+        return None
+
+    offset = len(TABLE_HEADER)
+    for table in tables:
+        size = STATE_COUNT * table.itemsize
+        table.frombytes(data[offset:offset + size])
+        offset += size
+
+    players, terminals, rewards, moves = tables
+    if not (set(players) <= {1, -1} and set(terminals) <= {0, 1} and set(rewards) <= {-1, 0, 1}
+            and max(moves) < 1 << CELLS):
+        return None
+    return tables
+
+
+def load_tables(path=TABLE_CACHE_PATH):
+    """
+    Loads the lookup tables from the cache file at path, building and storing them there if it is missing or invalid.
+    """
+    tables = read_tables(path)
+    if tables is not None:
+        return tables
+
+    tables = build_tables()
+    tmp_path = None
+    try:
+        directory = os.path.dirname(path) or os.curdir
+        os.makedirs(directory, exist_ok=True)
+        # write to a temporary file next to the cache first so concurrent processes never read a partial cache
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'wb') as file:
+            file.write(TABLE_HEADER)
+            for table in tables:
+                table.tofile(file)
+        os.replace(tmp_path, path)
+    except OSError:
+        # the cache is only an optimization
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return tables
+
+
+class FastNaughtsAndCrossesState(BaseState):
+    """
+    Naughts and crosses encoded as a base-3 integer, a perfect hash over all 3^9 boards.
+
+    Current player, legal moves, terminal flag and reward are looked up in tables which are built once on first use
+    and cached on disk, so every state operation is an index into a flat array. The game behaves exactly like
+    NaughtsAndCrossesState and uses the same actions.
+    """
+
+    players = None
+    terminals = None
+    rewards = None
+    actions = None
+
+    def __init__(self, code=0):
+        if FastNaughtsAndCrossesState.actions is None:
+            FastNaughtsAndCrossesState.load()
+        self.code = code
+
+    @classmethod
+    def load(cls, path=TABLE_CACHE_PATH):
+        players, terminals, rewards, moves = load_tables(path)
+        # one shared action object per (player, cell), and one shared tuple of them per state
+        cell_actions = {player: [Action(player=player, x=cell // 3, y=cell % 3) for cell in range(CELLS)]
+                        for player in (1, -1)}
+        cls.actions = [tuple(cell_actions[players[code]][cell] for cell in range(CELLS) if moves[code] >> cell & 1)
+                       for code in range(STATE_COUNT)]
+        cls.players = players
+        cls.terminals = terminals
+        # the same values as NaughtsAndCrossesState.get_reward: floats for wins, 0 for draws
+        cls.rewards = [float(reward) if reward else 0 for reward in rewards]
+
+    @classmethod
+    def from_state(cls, state: NaughtsAndCrossesState) -> 'FastNaughtsAndCrossesState':
+        return cls(encode_board(state.board))
+
+    @property
+    def board(self):
+        return decode_board(self.code)
+
+    def get_current_player(self):
+        return self.players[self.code]
+
+    def get_possible_actions(self):
+        return self.actions[self.code]
+
+    def take_action(self, action):
+        return FastNaughtsAndCrossesState(self.code + DIGITS[action.player] * POWERS[3 * action.x + action.y])
+
+    def is_terminal(self):
+        return self.terminals[self.code] != 0
+
+    def get_reward(self):
+        return self.rewards[self.code]
+
+    def __reduce__(self):
+        # unpickling goes through __init__, so the tables are loaded in worker processes as well
+        return FastNaughtsAndCrossesState, (self.code,)
+
+    def __eq__(self, other):
+        return self.__class__ == other.__class__ and self.code == other.code
+
+    def __hash__(self):
+        return self.code
+
+
+if __name__ == "__main__":
+    initial_state = FastNaughtsAndCrossesState()
+    searcher = MCTS(time_limit=1000)
+    action = searcher.search(initial_state=initial_state)
+
+    print(action)
@@ -60,18 +60,15 @@ class TreeNode:
         self.state = state
         self.is_terminal = state.is_terminal()
         self.is_fully_expanded = self.is_terminal
-        self.all_child_have_been_explored = False
         self.parent = parent
         self.numVisits = 0
         self.totalReward = 0
         self.children = {}
+        # children that have been expanded but not backpropagated yet
+        self.unvisited_children = []
 
     def all_child_have_at_least_one_visit(self,) -> bool:
-        if not self.all_child_have_been_explored:
-            if len(self.children) > 0:
-                self.all_child_have_been_explored = all([child.numVisits>0 for child in self.children.values()])
-            else: return False
-        return self.all_child_have_been_explored
+        return len(self.children) > 0 and not self.unvisited_children
 
     def __str__(self):
         s = ["totalReward: %s" % self.totalReward,
@@ -90,7 +87,8 @@ class MCTS:
                  exploration_constant: float = None,
                  explorationConstant=math.sqrt(2),
                  rollout_policy=None,
-                 rolloutPolicy=random_policy):
+                 rolloutPolicy=random_policy,
+                 first_play_urgency: float = float("inf")):
         # backwards compatibility
         time_limit = timeLimit if time_limit is None else time_limit
         iteration_limit = iterationLimit if iteration_limit is None else iteration_limit
@@ -114,6 +112,8 @@ class MCTS:
             self.limit_type = 'iterations'
         self.exploration_constant = exploration_constant
         self.rollout_policy = rollout_policy
+        # value of unvisited children during selection, infinity visits all children before any is revisited
+        self.first_play_urgency = first_play_urgency
 
     def search(self, initialState: BaseState = None, initial_state: BaseState = None, needDetails: bool = False,
                need_details: bool = None):
@@ -202,10 +202,7 @@ class MCTS:
     def select_node(self, node: TreeNode) -> TreeNode:
         while not node.is_terminal:
             if node.is_fully_expanded:
-                if node.all_child_have_at_least_one_visit():
-                    node = self.get_best_child(node, self.exploration_constant)
-                else:
-                    node = self.get_random_child(node)
+                node = self.select_child(node)
             else:
                 return self.expand(node)
         return node
@@ -216,31 +213,57 @@ class MCTS:
             if action not in node.children:
                 newNode = TreeNode(node.state.take_action(action), node)
                 node.children[action] = newNode
+                node.unvisited_children.append(newNode)
                 if len(actions) == len(node.children):
                     node.is_fully_expanded = True
                 return newNode
 
         raise Exception("Should never reach here")
 
-    def backpropogate(self, node: TreeNode, reward: float):
+    def backpropogate(self, node: TreeNode, reward: float, visits: int = 1):
+        # reward is the sum of the rewards of all visits
         while node is not None:
-            node.numVisits += 1
+            if node.numVisits == 0 and node.parent is not None:
+                node.parent.unvisited_children.remove(node)
+            node.numVisits += visits
             node.totalReward += reward
             node = node.parent
 
+    def select_child(self, node: TreeNode) -> TreeNode:
+        """
+        Picks the child to descend into during selection, valuing unvisited children with the first play urgency.
+        """
+        unvisited_children = node.unvisited_children
+        if unvisited_children and self.first_play_urgency == float("inf"):
+            return random.choice(unvisited_children)
+        best_value, best_nodes = self.get_best_visited_children(node, self.exploration_constant)
+        if unvisited_children and self.first_play_urgency >= best_value:
+            return random.choice(unvisited_children)
+        return random.choice(best_nodes)
+
     def get_best_child(self, node: TreeNode, explorationValue: float, exploration_value: float = None) -> TreeNode:
         exploration_value = explorationValue if exploration_value is None else exploration_value
+        return random.choice(self.get_best_visited_children(node, exploration_value)[1])
+
+    def get_best_visited_children(self, node: TreeNode, exploration_value: float) -> (float, [TreeNode]):
+        """
+        Returns the best UCT value among the visited children of node, and all visited children reaching it.
+        """
         best_value = float("-inf")
         best_nodes = []
+        player = node.state.get_current_player()
+        log_visits = math.log(node.numVisits) if node.numVisits > 0 else 0
         for child in node.children.values():
-            node_value = (node.state.get_current_player() * child.totalReward / child.numVisits +
-                          exploration_value * math.sqrt(math.log(node.numVisits) / child.numVisits))
+            if child.numVisits == 0:
+                continue
+            node_value = (player * child.totalReward / child.numVisits +
+                          exploration_value * math.sqrt(log_visits / child.numVisits))
             if node_value > best_value:
                 best_value = node_value
                 best_nodes = [child]
             elif node_value == best_value:
                 best_nodes.append(child)
-        return random.choice(best_nodes)
+        return best_value, best_nodes
 
     def get_random_child(self, node: TreeNode) -> TreeNode:
         return random.choice(list(node.children.values()))
@@ -0,0 +1,354 @@
+from __future__ import division
+
+import heapq
+import itertools
+import math
+import os
+import queue
+import threading
+import time
+from multiprocessing import Pool
+
+from mcts.base.base import BaseState
+from mcts.searcher.mcts import MCTS, TreeNode, random_policy
+
+_STOP = object()
+
+
+def _rollout_batch(rollout_policy, states, rollouts_per_leaf):
+    # runs in a worker process; a failing state only fails its own search
+    results = []
+    for state in states:
+        try:
+            results.append((True, sum(rollout_policy(state) for _ in range(rollouts_per_leaf))))
+        except Exception as error:
+            results.append((False, error))
+    return results
+
+
+class SearchRequest:
+    """
+    Handle for a single search submitted to a SearchScheduler.
+
+    The search tree lives in the scheduler's dispatcher thread; callers only wait for the result.
+    """
+
+    def __init__(self, initial_state: BaseState, deadline: float, iteration_limit: int = None,
+                 need_details: bool = False, rollouts_per_leaf: int = 1):
+        self.root = TreeNode(initial_state, None)
+        # absolute time.time() at which the search has to be answered
+        self.deadline = deadline
+        self.iteration_limit = iteration_limit
+        self.need_details = need_details
+        self.rollouts_per_leaf = rollouts_per_leaf
+        # number of selected leaves whose rollouts have not come back yet
+        self.in_flight = 0
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def result(self, timeout: float = None):
+        """
+        Blocks until the search has finished and returns its result.
+
+        Parameters
+        ----------
+        timeout: [float] maximum number of seconds to wait, None waits forever
+
+        Returns
+        -------
+        any: the best action, or (action, expected reward) if need_details was set
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError("Search did not finish within the given timeout")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _budget_met(self, now: float) -> bool:
+        if self.root.numVisits == 0:
+            # always answer with at least one completed round
+            return False
+        if self.iteration_limit is not None and self.root.numVisits >= self.iteration_limit:
+            return True
+        return now >= self.deadline
+
+    def _started(self) -> int:
+        return self.root.numVisits + self.in_flight * self.rollouts_per_leaf
+
+    def _priority(self):
+        # the search with the fewest rounds goes first, the earlier deadline breaks ties
+        return self._started(), self.deadline
+
+    def _needs_round(self, now: float) -> bool:
+        started = self._started()
+        if self.iteration_limit is not None and started >= self.iteration_limit:
+            return False
+        if now >= self.deadline:
+            # searches past their deadline are only fed until they have one round
+            return started == 0
+        return True
+
+    def _set_result(self, result):
+        self._result = result
+        self._done.set()
+
+    def _set_error(self, error: BaseException):
+        self._error = error
+        self._done.set()
+
+
+class SearchScheduler:
+    """
+    Runs many concurrent searches on one fixed pool of worker processes.
+
+    Selection, expansion and backpropagation of every search happen in a single dispatcher thread, while rollouts
+    are farmed out to the pool in batches of leaves, so one task amortizes its round trip over many rounds. Workers are shared between all live searches: the next round always goes to the
+    search with the fewest rounds so far, the earlier deadline breaking ties. Each search is answered as soon as
+    its budget is met. The rollout policy and the states have to be picklable.
+    """
+
+    def __init__(self,
+                 n_jobs: int = None,
+                 exploration_constant: float = math.sqrt(2),
+                 rollout_policy=random_policy,
+                 max_in_flight: int = 1,
+                 first_play_urgency: float = float("inf"),
+                 batch_size: int = 32,
+                 rollouts_per_leaf: int = 1):
+        """
+        Parameters
+        ----------
+        n_jobs: [int] number of worker processes, defaults to the number of CPUs
+        exploration_constant: [float] exploration constant used during selection
+        rollout_policy: [callable] picklable function mapping a state to a reward
+        max_in_flight: [int] maximum number of concurrent rollouts per search. With the default of 1 every search
+            performs exactly the rounds a sequential MCTS.search would.
+        first_play_urgency: [float] value of unvisited children during selection, see MCTS
+        batch_size: [int] maximum number of leaves sent to a worker in one task
+        rollouts_per_leaf: [int] number of rollouts run from each selected leaf, each one counting as a round. Values
+            above 1 trade search quality for throughput when a single search has to keep all workers busy.
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least one")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least one")
+        if rollouts_per_leaf < 1:
+            raise ValueError("rollouts_per_leaf must be at least one")
+        self.n_jobs = n_jobs if n_jobs is not None else os.cpu_count() or 1
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+        self.rollouts_per_leaf = rollouts_per_leaf
+        # keep a second task queued per worker, so workers never wait for the dispatcher
+        self._max_tasks = 2 * self.n_jobs
+        # only used for its tree operations, the limit is never consulted
+        self.searcher = MCTS(iteration_limit=1, exploration_constant=exploration_constant,
+                             rollout_policy=rollout_policy, first_play_urgency=first_play_urgency)
+        self.rollout_policy = rollout_policy
+
+        self._events = queue.Queue()
+        self._active = []
+        # number of batches sent to the pool that have not come back yet
+        self._in_flight = 0
+        self._closed = False
+        # makes closing and queueing submissions atomic, so no submission can end up behind the stop event
+        self._lock = threading.Lock()
+        self._pool = Pool(self.n_jobs)
+        self._dispatcher = threading.Thread(target=self._run, name="mcts-scheduler", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, initial_state: BaseState, time_limit: int, iteration_limit: int = None,
+               need_details: bool = False) -> SearchRequest:
+        """
+        Schedules a search and returns immediately.
+
+        Parameters
+        ----------
+        initial_state: [BaseState] the state to search from
+        time_limit: [int] budget in milliseconds, the deadline also breaks ties between searches
+        iteration_limit: [int] optional number of rounds after which the search is answered early
+        need_details: [bool] whether the result also contains the expected reward
+
+        Returns
+        -------
+        SearchRequest: handle to wait for the result on
+        """
+        if iteration_limit is not None and iteration_limit < 1:
+            raise ValueError("Iteration limit must be greater than one")
+        request = SearchRequest(initial_state, time.time() + time_limit / 1000, iteration_limit, need_details,
+                                self.rollouts_per_leaf)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Cannot submit to a closed scheduler")
+            self._events.put(('submit', request))
+        return request
+
+    def search(self, initial_state: BaseState, time_limit: int, iteration_limit: int = None,
+               need_details: bool = False):
+        """
+        Schedules a search and blocks until it has been answered, see submit.
+        """
+        return self.submit(initial_state, time_limit, iteration_limit, need_details).result()
+
+    def close(self):
+        """
+        Stops the dispatcher and the worker pool. Searches that are still pending fail with a RuntimeError.
+        """
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._events.put((_STOP,))
+        self._dispatcher.join()
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _run(self):
+        try:
+            self._loop()
+        except BaseException as error:
+            # never leave callers blocked on a dead dispatcher, they receive the error instead
+            with self._lock:
+                self._closed = True
+            failure = RuntimeError("Scheduler dispatcher failed: %r" % error)
+            failure.__cause__ = error
+            self._abort(failure)
+
+    def _loop(self):
+        while True:
+            try:
+                event = self._events.get(timeout=self._next_timeout())
+            except queue.Empty:
+                event = None
+            while event is not None:
+                if event[0] is _STOP:
+                    self._abort(RuntimeError("Scheduler was closed before the search finished"))
+                    return
+                self._handle(event)
+                try:
+                    event = self._events.get_nowait()
+                except queue.Empty:
+                    event = None
+            self._finish()
+            self._dispatch()
+
+    def _next_timeout(self):
+        # searches with rollouts in flight, or still without any round, are woken up by rollout results. All others
+        # have to be answered at their deadline, even if it passed since the last call to _finish.
+        deadlines = [request.deadline for request in self._active
+                     if request.in_flight == 0 and request.root.numVisits > 0]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.time())
+
+    def _handle(self, event):
+        kind = event[0]
+        if kind == 'submit':
+            self._active.append(event[1])
+            return
+
+        self._in_flight -= 1
+        leaves = event[1]
+        if kind == 'result':
+            results = event[2]
+        else:
+            # the whole task failed, e.g. because a state could not be pickled
+            results = [(False, event[2])] * len(leaves)
+        for (request, node), (success, value) in zip(leaves, results):
+            request.in_flight -= 1
+            if request.done():
+                continue
+            if success:
+                self.searcher.backpropogate(node, value, request.rollouts_per_leaf)
+            else:
+                self._fail(request, value)
+
+    def _fail(self, request: SearchRequest, error: BaseException):
+        # late rollouts of a failed search are ignored by _handle
+        self._active.remove(request)
+        request._set_error(error)
+
+    def _finish(self):
+        now = time.time()
+        for request in [request for request in self._active if request.in_flight == 0 and request._budget_met(now)]:
+            self._active.remove(request)
+            try:
+                request._set_result(self._best_action(request))
+            except Exception as error:
+                request._set_error(error)
+
+    def _best_action(self, request: SearchRequest):
+        root = request.root
+        best_child = self.searcher.get_best_child(root, 0)
+        action = (action for action, node in root.children.items() if node is best_child).__next__()
+        if request.need_details:
+            return action, best_child.totalReward / best_child.numVisits
+        else:
+            return action
+
+    def _dispatch(self):
+        free_tasks = self._max_tasks - self._in_flight
+        if free_tasks <= 0:
+            return
+        now = time.time()
+        # the counter keeps requests out of the comparison
+        counter = itertools.count()
+        candidates = [(request._priority(), next(counter), request) for request in self._active
+                      if request.in_flight < self.max_in_flight and request._needs_round(now)]
+        if not candidates:
+            return
+        heapq.heapify(candidates)
+        # spread the available leaves over the free tasks, but never below one leaf per task
+        capacity = sum(self.max_in_flight - candidate[2].in_flight for candidate in candidates)
+        task_size = min(self.batch_size, -(-capacity // free_tasks))
+
+        batch = []
+        while candidates and self._in_flight < self._max_tasks:
+            request = heapq.heappop(candidates)[2]
+            try:
+                node = self.searcher.select_node(request.root)
+            except Exception as error:
+                self._fail(request, error)
+                continue
+            request.in_flight += 1
+            batch.append((request, node))
+            if request.in_flight < self.max_in_flight and request._needs_round(now):
+                heapq.heappush(candidates, (request._priority(), next(counter), request))
+            if len(batch) == task_size:
+                self._submit_batch(batch)
+                batch = []
+        if batch:
+            self._submit_batch(batch)
+
+    def _submit_batch(self, batch):
+        states = [node.state for request, node in batch]
+        self._in_flight += 1
+        try:
+            self._pool.apply_async(
+                _rollout_batch, (self.rollout_policy, states, self.rollouts_per_leaf),
+                callback=lambda results: self._events.put(('result', batch, results)),
+                error_callback=lambda error: self._events.put(('error', batch, error)))
+        except Exception as error:
+            self._handle(('error', batch, error))
+
+    def _abort(self, error: BaseException):
+        # submissions still queued were never added to the active searches
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'submit':
+                self._active.append(event[1])
+        for request in self._active:
+            if not request.done():
+                request._set_error(error)
+        self._active = []
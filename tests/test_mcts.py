@@ -0,0 +1,54 @@
+import unittest
+
+from mcts.example.naughtsandcrossesfast import FastNaughtsAndCrossesState
+from mcts.searcher.mcts import MCTS, TreeNode
+
+
+class FirstPlayUrgencyTest(unittest.TestCase):
+    def setUp(self):
+        self.root = TreeNode(FastNaughtsAndCrossesState(), None)
+
+    def expand_root(self, searcher):
+        # every child but the last one is visited once with a win for the player to move
+        for _ in self.root.state.get_possible_actions():
+            searcher.expand(self.root)
+        children = list(self.root.children.values())
+        for child in children[:-1]:
+            searcher.backpropogate(child, 1.0)
+        return children[-1]
+
+    def test_infinite_urgency_selects_unvisited_child(self):
+        searcher = MCTS(iteration_limit=1)
+        unvisited = self.expand_root(searcher)
+        self.assertIs(unvisited, searcher.select_node(self.root).parent)
+
+    def test_finite_urgency_selects_better_visited_child(self):
+        searcher = MCTS(iteration_limit=1, first_play_urgency=0.5)
+        unvisited = self.expand_root(searcher)
+        self.assertIsNot(unvisited, searcher.select_node(self.root).parent)
+        self.assertEqual([unvisited], self.root.unvisited_children)
+
+    def test_finite_urgency_selects_unvisited_child_over_worse_visited_children(self):
+        searcher = MCTS(iteration_limit=1, first_play_urgency=5.0)
+        unvisited = self.expand_root(searcher)
+        self.assertIs(unvisited, searcher.select_node(self.root).parent)
+
+    def test_best_child_ignores_unvisited_children(self):
+        searcher = MCTS(iteration_limit=1)
+        unvisited = self.expand_root(searcher)
+        for _ in range(20):
+            best_child = searcher.get_best_child(self.root, 0)
+            self.assertIsNot(unvisited, best_child)
+            self.assertEqual(1.0, best_child.totalReward / best_child.numVisits)
+
+    def test_backpropagation_marks_children_visited(self):
+        searcher = MCTS(iteration_limit=1)
+        unvisited = self.expand_root(searcher)
+        self.assertFalse(self.root.all_child_have_at_least_one_visit())
+        searcher.backpropogate(unvisited, 0.0)
+        self.assertEqual([], self.root.unvisited_children)
+        self.assertTrue(self.root.all_child_have_at_least_one_visit())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import pickle
+import random
+import tempfile
+import unittest
+
+from mcts.example import naughtsandcrossesfast
+from mcts.example.naughtsandcrosses import NaughtsAndCrossesState
+from mcts.example.naughtsandcrossesfast import FastNaughtsAndCrossesState
+
+
+class FastNaughtsAndCrossesStateTest(unittest.TestCase):
+    def assertSameState(self, expected, actual):
+        self.assertEqual(expected.board, actual.board)
+        self.assertEqual(expected.get_current_player(), actual.get_current_player())
+        self.assertEqual(expected.is_terminal(), actual.is_terminal())
+        self.assertEqual(list(expected.get_possible_actions()), list(actual.get_possible_actions()))
+        reward = expected.get_reward()
+        self.assertEqual(reward, actual.get_reward())
+        self.assertIs(type(reward), type(actual.get_reward()))
+
+    def test_agrees_with_naughts_and_crosses_over_random_playouts(self):
+        random.seed(0)
+        for _ in range(500):
+            expected = NaughtsAndCrossesState()
+            actual = FastNaughtsAndCrossesState()
+            while True:
+                self.assertSameState(expected, actual)
+                self.assertEqual(actual, FastNaughtsAndCrossesState.from_state(expected))
+                if expected.is_terminal():
+                    break
+                action = random.choice(expected.get_possible_actions())
+                expected = expected.take_action(action)
+                actual = actual.take_action(action)
+
+    def test_pickled_state_keeps_its_board(self):
+        state = FastNaughtsAndCrossesState()
+        state = state.take_action(state.get_possible_actions()[4])
+        self.assertEqual(state, pickle.loads(pickle.dumps(state)))
+
+    def test_invalid_cache_is_rebuilt(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tables.bin")
+            expected = naughtsandcrossesfast.load_tables(path)
+            with open(path, 'rb') as file:
+                valid = file.read()
+            for invalid in (b"\x07" * len(valid), valid[:-1], valid + b"\x00", b"X" + valid[1:]):
+                with open(path, 'wb') as file:
+                    file.write(invalid)
+                self.assertIsNone(naughtsandcrossesfast.read_tables(path))
+                self.assertEqual(expected, naughtsandcrossesfast.load_tables(path))
+                with open(path, 'rb') as file:
+                    self.assertEqual(valid, file.read())
+
+    def test_cache_with_bare_file_name_is_written_to_working_directory(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                naughtsandcrossesfast.load_tables("tables.bin")
+                self.assertEqual(["tables.bin"], os.listdir(directory))
+            finally:
+                os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import threading
+import unittest
+
+from mcts.example.naughtsandcrosses import NaughtsAndCrossesState
+from mcts.example.naughtsandcrossesfast import FastNaughtsAndCrossesState
+from mcts.searcher.scheduler import SearchRequest, SearchScheduler
+
+
+def zero_policy(state):
+    return 0
+
+
+def failing_policy(state):
+    if isinstance(state, FailingRolloutState):
+        raise ValueError("rollout failed")
+    return 0
+
+
+class FailingRolloutState(NaughtsAndCrossesState):
+    pass
+
+
+class BrokenState(NaughtsAndCrossesState):
+    def get_possible_actions(self):
+        raise ValueError("broken state")
+
+
+class UnpicklableState(NaughtsAndCrossesState):
+    def __deepcopy__(self, memo):
+        state = UnpicklableState()
+        state.board = [row[:] for row in self.board]
+        state.currentPlayer = self.currentPlayer
+        return state
+
+    def __reduce__(self):
+        raise TypeError("state cannot be pickled")
+
+
+class SearchSchedulerTest(unittest.TestCase):
+    def test_every_search_gets_a_share_of_rounds(self):
+        with SearchScheduler(n_jobs=2, rollout_policy=zero_policy) as scheduler:
+            requests = [scheduler.submit(FastNaughtsAndCrossesState(), time_limit=500) for _ in range(10)]
+            for request in requests:
+                request.result(timeout=10)
+        visits = [request.root.numVisits for request in requests]
+        self.assertGreater(min(visits), max(visits) // 4, visits)
+
+    def test_fewest_rounds_then_earliest_deadline_goes_first(self):
+        late = SearchRequest(FastNaughtsAndCrossesState(), deadline=2.0)
+        early = SearchRequest(FastNaughtsAndCrossesState(), deadline=1.0)
+        started = SearchRequest(FastNaughtsAndCrossesState(), deadline=0.5)
+        started.in_flight = 1
+        ordered = sorted([late, started, early], key=SearchRequest._priority)
+        self.assertEqual([early, late, started], ordered)
+
+    def test_iteration_limit_answers_before_the_deadline(self):
+        with SearchScheduler(n_jobs=1, rollout_policy=zero_policy) as scheduler:
+            request = scheduler.submit(FastNaughtsAndCrossesState(), time_limit=60000, iteration_limit=20,
+                                       need_details=True)
+            action, reward = request.result(timeout=10)
+        self.assertIn(action, FastNaughtsAndCrossesState().get_possible_actions())
+        self.assertEqual(0, reward)
+        self.assertEqual(20, request.root.numVisits)
+
+    def test_rollouts_per_leaf_count_as_rounds(self):
+        with SearchScheduler(n_jobs=1, rollout_policy=zero_policy, rollouts_per_leaf=4) as scheduler:
+            request = scheduler.submit(FastNaughtsAndCrossesState(), time_limit=60000, iteration_limit=20)
+            request.result(timeout=10)
+        self.assertEqual(20, request.root.numVisits)
+        self.assertTrue(all(child.numVisits % 4 == 0 for child in request.root.children.values()))
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            SearchScheduler(max_in_flight=0)
+        with self.assertRaises(ValueError):
+            SearchScheduler(batch_size=0)
+        with self.assertRaises(ValueError):
+            SearchScheduler(rollouts_per_leaf=0)
+
+    def test_close_fails_pending_searches(self):
+        scheduler = SearchScheduler(n_jobs=1, rollout_policy=zero_policy)
+        request = scheduler.submit(FastNaughtsAndCrossesState(), time_limit=60000)
+        scheduler.close()
+        with self.assertRaises(RuntimeError):
+            request.result(timeout=10)
+        with self.assertRaises(RuntimeError):
+            scheduler.submit(FastNaughtsAndCrossesState(), time_limit=100)
+
+    def test_failing_rollout_fails_only_its_search(self):
+        with SearchScheduler(n_jobs=1, rollout_policy=failing_policy) as scheduler:
+            failing = scheduler.submit(FailingRolloutState(), time_limit=200)
+            healthy = scheduler.submit(NaughtsAndCrossesState(), time_limit=200)
+            with self.assertRaisesRegex(ValueError, "rollout failed"):
+                failing.result(timeout=10)
+            self.assertIsNotNone(healthy.result(timeout=10))
+
+    def test_failing_task_fails_its_searches(self):
+        with SearchScheduler(n_jobs=1, rollout_policy=zero_policy) as scheduler:
+            request = scheduler.submit(UnpicklableState(), time_limit=200)
+            with self.assertRaisesRegex(TypeError, "cannot be pickled"):
+                request.result(timeout=10)
+
+    def test_failing_selection_fails_only_its_search(self):
+        with SearchScheduler(n_jobs=1, rollout_policy=zero_policy) as scheduler:
+            broken = scheduler.submit(BrokenState(), time_limit=200)
+            healthy = scheduler.submit(FastNaughtsAndCrossesState(), time_limit=200)
+            with self.assertRaisesRegex(ValueError, "broken state"):
+                broken.result(timeout=10)
+            self.assertIsNotNone(healthy.result(timeout=10))
+            self.assertTrue(scheduler._dispatcher.is_alive())
+
+    def test_dispatcher_failure_fails_active_and_queued_searches(self):
+        scheduler = SearchScheduler(n_jobs=1, rollout_policy=zero_policy)
+        handled = threading.Event()
+        release = threading.Event()
+        handle = scheduler._handle
+
+        def failing_handle(event):
+            handle(event)
+            handled.set()
+            release.wait()
+            raise RuntimeError("dispatcher broke")
+
+        scheduler._handle = failing_handle
+        active = scheduler.submit(FastNaughtsAndCrossesState(), time_limit=60000)
+        self.assertTrue(handled.wait(10))
+        queued = scheduler.submit(FastNaughtsAndCrossesState(), time_limit=60000)
+        release.set()
+        for request in (active, queued):
+            with self.assertRaisesRegex(RuntimeError, "dispatcher failed"):
+                request.result(timeout=10)
+        with self.assertRaises(RuntimeError):
+            scheduler.submit(FastNaughtsAndCrossesState(), time_limit=100)
+        scheduler.close()
+
+
+if __name__ == '__main__':
+    unittest.main()